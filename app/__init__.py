@@ -1,4 +1,5 @@
 from flask import Flask
+import click
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 import os
@@ -6,6 +7,82 @@ import os
 db = SQLAlchemy()
 login_manager = LoginManager()
 
+# Bump whenever a model adds a table, column or index, or drops an index, so
+# existing databases are brought up to date once on the next start.
+SCHEMA_VERSION = 11
+
+# Indexes that earlier versions created and no query uses any more
+DROPPED_INDEXES = ['ix_item_message_receiver_unread']
+
+def upgrade_schema():
+    """Add columns and indexes that models define but existing tables lack.
+
+    db.create_all() only creates missing tables. New columns need a constant
+    server_default (or be nullable) for SQLite's ALTER TABLE ADD COLUMN; a
+    column with ``info={'backfill': '<other column>'}`` is then filled from
+    that column for existing rows. A table that the model declares
+    ``sqlite_autoincrement`` but that was created without it is rebuilt.
+    Indexes listed in DROPPED_INDEXES are removed.
+    """
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(dialect=db.engine.dialect)}'
+                if column.server_default is not None:
+                    ddl += f' DEFAULT {column.server_default.arg}'
+                conn.exec_driver_sql(ddl)
+                if 'backfill' in column.info:
+                    conn.exec_driver_sql(
+                        f'UPDATE "{table.name}" SET "{column.name}" = "{column.info["backfill"]}" '
+                        f'WHERE "{column.name}" IS NULL'
+                    )
+            if table.dialect_options['sqlite']['autoincrement']:
+                add_autoincrement(conn, table)
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        for name in DROPPED_INDEXES:
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
+
+def add_autoincrement(conn, table):
+    """Rebuild table with AUTOINCREMENT if it was created without it.
+
+    Follows SQLite's create-copy-drop-rename procedure. Child tables refer to
+    the table by name, so their foreign keys keep pointing at the rebuilt
+    table; its indexes are recreated by the caller.
+    """
+    sql = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+    ).scalar()
+    if 'AUTOINCREMENT' in sql.upper():
+        return
+    rebuilt = f'_{table.name}_rebuild'
+    ddl = str(db.schema.CreateTable(table).compile(dialect=conn.dialect)).strip()
+    conn.exec_driver_sql(ddl.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE "{rebuilt}" ', 1))
+    columns = ', '.join(f'"{column.name}"' for column in table.columns)
+    conn.exec_driver_sql(f'INSERT INTO "{rebuilt}" ({columns}) SELECT {columns} FROM "{table.name}"')
+    conn.exec_driver_sql(f'DROP TABLE "{table.name}"')
+    conn.exec_driver_sql(f'ALTER TABLE "{rebuilt}" RENAME TO "{table.name}"')
+
+def ensure_schema(app):
+    """Create/upgrade tables only if the database is behind SCHEMA_VERSION.
+
+    The version is kept in SQLite's ``user_version`` pragma, so a warm start
+    costs a single pragma read instead of a reflection and DDL round-trip.
+    """
+    with app.app_context():
+        with db.engine.connect() as conn:
+            current = conn.exec_driver_sql('PRAGMA user_version').scalar()
+        if current == SCHEMA_VERSION:
+            return
+        db.create_all()
+        upgrade_schema()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
 def create_app():
     # Get the root directory (parent of app/)
     basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
@@ -23,8 +100,19 @@ def create_app():
     # Create upload folder if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
+    app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 30))
+    app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN')
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_FORMAT'] = os.environ.get('PROFILE_FORMAT', 'collapsed')
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(basedir, 'profiles'))
+    
+    from app import cache, compression, profiling
+    
     db.init_app(app)
     login_manager.init_app(app)
+    cache.init_app(app)
+    compression.init_app(app)
+    profiling.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     
@@ -46,9 +134,24 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(api_bp, url_prefix='/api')
     
-    # Create tables
-    with app.app_context():
-        db.create_all()
+    @app.cli.command('build-recommendations')
+    @click.option('--full', is_flag=True, help='Recompute every item, not just changed ones.')
+    def build_recommendations(full):
+        """Precompute similar / also-rented items."""
+        # Imported here so NumPy/SciPy are only loaded by the batch job
+        from app.recommendations import build_similar_items
+        refreshed = build_similar_items(full=full)
+        click.echo(f'Refreshed recommendations for {refreshed} items')
+    
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups():
+        """Recompute earnings rollups from all rentals."""
+        from app.analytics import rebuild_all_rollups
+        rebuild_all_rollups()
+        click.echo('Earnings rollups rebuilt')
+    
+    # Create tables (skipped when the stored schema version is current)
+    ensure_schema(app)
     
     return app
 
@@ -0,0 +1,113 @@
+"""Owner earnings rollups.
+
+ItemDailyRollup holds one row per item per day that is covered by a
+confirmed or completed rental. Rows are rewritten for a rental's date range
+whenever its status or payment changes, inside the same transaction, so the
+earnings endpoint never has to read the rental table.
+"""
+import calendar
+from datetime import timedelta
+
+from app import db
+from app.models import Item, Rental, ItemDailyRollup
+from app.money import to_cents, from_cents, split_cents
+
+COUNTED_STATUSES = ('confirmed', 'completed')
+GRANULARITIES = ('day', 'week', 'month')
+INSERT_BATCH = 1000
+
+
+def _accumulate(rentals, start=None, end=None):
+    """Spread rentals over their days; returns {(item_id, day): [revenue_cents, booked, bookings]}.
+
+    A rental's total is split in whole cents, so its days always add up to
+    exactly total_amount; leftover cents go to the first days.
+    """
+    totals = {}
+    for rental in rentals:
+        days = (rental.end_date - rental.start_date).days
+        if days <= 0:
+            continue
+        per_day = split_cents(to_cents(rental.total_amount), days)
+        first = max(rental.start_date, start) if start else rental.start_date
+        last = min(rental.end_date, end) if end else rental.end_date
+        day = first
+        while day < last:
+            row = totals.setdefault((rental.item_id, day), [0, 0, 0])
+            row[0] += per_day[(day - rental.start_date).days]
+            row[1] += 1
+            if day == rental.start_date:
+                row[2] += 1
+            day += timedelta(days=1)
+    return totals
+
+
+def _insert(totals, owners):
+    records = [{
+        'item_id': item_id,
+        'day': day,
+        'owner_id': owners[item_id],
+        'revenue': from_cents(revenue),
+        'booked': booked,
+        'bookings': bookings
+    } for (item_id, day), (revenue, booked, bookings) in totals.items() if item_id in owners]
+    for start in range(0, len(records), INSERT_BATCH):
+        db.session.execute(db.insert(ItemDailyRollup), records[start:start + INSERT_BATCH])
+
+
+def refresh_item_rollups(item_id, start, end):
+    """Rewrite an item's rollup rows for days in [start, end).
+
+    Does not commit; call before the caller's commit so the rollup changes
+    land in the same transaction as the rental change.
+    """
+    owner_id = db.session.query(Item.owner_id).filter(Item.id == item_id).scalar()
+    ItemDailyRollup.query.filter(
+        ItemDailyRollup.item_id == item_id,
+        ItemDailyRollup.day >= start,
+        ItemDailyRollup.day < end
+    ).delete(synchronize_session=False)
+    if owner_id is None:
+        return
+    rentals = Rental.query.filter(
+        Rental.item_id == item_id,
+        Rental.status.in_(COUNTED_STATUSES),
+        Rental.start_date < end,
+        Rental.end_date > start
+    ).all()
+    _insert(_accumulate(rentals, start, end), {item_id: owner_id})
+
+
+def refresh_rental_rollups(rental):
+    """Rewrite rollup rows for the days covered by a rental."""
+    refresh_item_rollups(rental.item_id, rental.start_date, rental.end_date)
+
+
+def rebuild_all_rollups():
+    """Recompute every rollup row from the rental table (backfill / repair)."""
+    ItemDailyRollup.query.delete(synchronize_session=False)
+    owners = dict(db.session.query(Item.id, Item.owner_id))
+    rentals = Rental.query.filter(Rental.status.in_(COUNTED_STATUSES)).yield_per(INSERT_BATCH)
+    _insert(_accumulate(rentals), owners)
+    db.session.commit()
+
+
+def period_expression(granularity):
+    """SQL expression giving the ISO start date of the period a rollup day is in."""
+    if granularity == 'week':
+        return db.func.date(ItemDailyRollup.day, 'weekday 0', '-6 days')
+    if granularity == 'month':
+        return db.func.strftime('%Y-%m-01', ItemDailyRollup.day)
+    return db.func.date(ItemDailyRollup.day)
+
+
+def period_days(granularity, period_start, start, end):
+    """Number of days of a period that fall inside the inclusive range [start, end]."""
+    if granularity == 'week':
+        period_end = period_start + timedelta(days=6)
+    elif granularity == 'month':
+        last = calendar.monthrange(period_start.year, period_start.month)[1]
+        period_end = period_start.replace(day=last)
+    else:
+        period_end = period_start
+    return (min(period_end, end) - max(period_start, start)).days + 1
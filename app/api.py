@@ -1,27 +1,111 @@
-from flask import Blueprint, request, jsonify, send_from_directory, current_app
+from flask import Blueprint, Response, request, jsonify, send_from_directory, current_app, abort, stream_with_context
 from flask_login import login_required, current_user
 from app import db
-from app.models import Item, Rental, Payment, User, ItemReview, ItemMessage
+from app.models import Item, Rental, Payment, User, ItemReview, ItemMessage, ItemSimilarity, ItemDailyRollup, Tombstone
+from app.cache import clear_pages, not_modified, set_validator
+from app.batch import validate_operations, run_batch
+from app.sync import decode_cursor, encode_cursor, changed_since
+from app.analytics import GRANULARITIES, refresh_rental_rollups, period_expression, period_days
+from app import bulk
 from werkzeug.utils import secure_filename
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import os
+import zipfile
 
 api_bp = Blueprint('api', __name__)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+READ_ONLY_POSTS = {'api.quote_item'}
+
+@api_bp.after_request
+def invalidate_pages(response):
+    """Drop this worker's cached anonymous pages after any successful write"""
+    if request.method != 'GET' and request.endpoint not in READ_ONLY_POSTS and response.status_code < 400:
+        clear_pages()
+    return response
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def page_size(limit):
+    """Clamp a requested page size to (0, MAX_PAGE_SIZE]"""
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+def parse_ids(value):
+    """Parse a comma-separated id list ("1,2,3"); raises ValueError if malformed"""
+    ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    if not ids or len(ids) > MAX_PAGE_SIZE:
+        raise ValueError(value)
+    return ids
+
+def rating_summary(item_id):
+    """Return (average_rating, rating_count) for an item from one aggregate query"""
+    average, count = db.session.query(
+        db.func.avg(ItemReview.rating), db.func.count(ItemReview.id)
+    ).filter(ItemReview.item_id == item_id).one()
+    return (round(average, 1) if count else None), count
+
+def rating_summaries(item_ids):
+    """Return {item_id: (average_rating, rating_count)} for many items in one query"""
+    rows = db.session.query(
+        ItemReview.item_id, db.func.avg(ItemReview.rating), db.func.count(ItemReview.id)
+    ).filter(ItemReview.item_id.in_(item_ids)).group_by(ItemReview.item_id)
+    return {item_id: (round(average, 1), count) for item_id, average, count in rows}
+
+def similar_items(item_id, limit=None):
+    """Return precomputed 'similar' and 'also_rented' neighbours of an item"""
+    limit = page_size(limit)
+    rows = db.session.query(ItemSimilarity.kind, ItemSimilarity.score, Item).join(
+        Item, Item.id == ItemSimilarity.neighbor_id
+    ).filter(
+        ItemSimilarity.item_id == item_id,
+        Item.is_available == True
+    ).order_by(ItemSimilarity.kind, ItemSimilarity.rank).all()
+    result = {'similar': [], 'also_rented': []}
+    for kind, score, item in rows:
+        neighbours = result.setdefault(kind, [])
+        if len(neighbours) < limit:
+            neighbours.append({
+                'id': item.id,
+                'name': item.name,
+                'category': item.category,
+                'daily_rate': item.daily_rate,
+                'image_path': item.image_path,
+                'score': score
+            })
+    return result
+
+def get_reviews_page(item_id, before_id=None, limit=None):
+    """Return one page of an item's reviews (authors joined) and the next cursor"""
+    limit = page_size(limit)
+    query = ItemReview.query.options(db.joinedload(ItemReview.user)).filter(ItemReview.item_id == item_id)
+    if before_id:
+        query = query.filter(ItemReview.id < before_id)
+    reviews = query.order_by(ItemReview.id.desc()).limit(limit + 1).all()
+    next_before = reviews[limit - 1].id if len(reviews) > limit else None
+    return reviews[:limit], next_before
+
 # Item APIs
 @api_bp.route('/items', methods=['GET'])
 def get_items():
-    """Get all available items with optional filters"""
+    """Get all available items with optional filters, or specific items by ``ids``"""
     category = request.args.get('category', '')
     search = request.args.get('search', '')
     owner_id = request.args.get('owner_id', type=int)
+    ids = None
     
-    query = Item.query.filter_by(is_available=True)
+    if request.args.get('ids'):
+        try:
+            ids = parse_ids(request.args['ids'])
+        except ValueError:
+            return jsonify({'error': f'ids must be 1-{MAX_PAGE_SIZE} comma-separated integers'}), 400
+        query = Item.query.filter(Item.id.in_(ids))
+    else:
+        query = Item.query.filter_by(is_available=True)
     
     if category:
         query = query.filter_by(category=category)
@@ -32,9 +116,20 @@ def get_items():
     if owner_id:
         query = query.filter_by(owner_id=owner_id)
     
-    items = query.all()
+    # Any insert, delete or version bump in the result set changes this stamp;
+    # relies on item ids never being reused (Item is AUTOINCREMENT)
+    stamp = query.with_entities(
+        db.func.count(Item.id), db.func.max(Item.id), db.func.sum(Item.id), db.func.sum(Item.version)
+    ).one()
+    etag = 'items-' + '-'.join(str(value or 0) for value in stamp)
+    cached = not_modified(etag)
+    if cached:
+        return cached
     
-    return jsonify({
+    items = query.options(db.joinedload(Item.owner)).all()
+    ratings = rating_summaries([item.id for item in items]) if items else {}
+    
+    payload = {
         'items': [{
             'id': item.id,
             'name': item.name,
@@ -43,25 +138,42 @@ def get_items():
             'daily_rate': item.daily_rate,
             'image_path': item.image_path,
             'location': item.location,
+            'is_available': item.is_available,
             'owner_id': item.owner_id,
             'owner_name': item.owner.full_name,
-            'average_rating': item.average_rating,
-            'rating_count': item.rating_count,
+            'average_rating': ratings.get(item.id, (None, 0))[0],
+            'rating_count': ratings.get(item.id, (None, 0))[1],
             'created_at': item.created_at.isoformat()
         } for item in items]
-    }), 200
+    }
+    if ids is not None:
+        position = {item_id: n for n, item_id in enumerate(ids)}
+        payload['items'].sort(key=lambda item: position[item['id']])
+        found = {item.id for item in items}
+        payload['not_found'] = [item_id for item_id in ids if item_id not in found]
+    response = jsonify(payload)
+    return set_validator(response, etag), 200
 
 @api_bp.route('/items/<int:item_id>', methods=['GET'])
 def get_item(item_id):
     """Get a specific item by ID"""
     item = Item.query.get_or_404(item_id)
+    # Unique per item: ids are never reused, so a recreated item cannot match
+    etag = f'item-{item.id}-{item.version}'
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    average_rating, rating_count = rating_summary(item_id)
     
-    return jsonify({
+    response = jsonify({
         'id': item.id,
         'name': item.name,
         'description': item.description,
         'category': item.category,
         'daily_rate': item.daily_rate,
+        'weekend_surcharge_pct': item.weekend_surcharge_pct,
+        'weekly_discount_pct': item.weekly_discount_pct,
+        'monthly_discount_pct': item.monthly_discount_pct,
         'image_path': item.image_path,
         'location': item.location,
         'is_available': item.is_available,
@@ -69,17 +181,79 @@ def get_item(item_id):
         'owner_name': item.owner.full_name,
         'owner_email': item.owner.email,
         'owner_phone': item.owner.phone,
-        'average_rating': item.average_rating,
-        'rating_count': item.rating_count,
+        'average_rating': average_rating,
+        'rating_count': rating_count,
         'created_at': item.created_at.isoformat()
+    })
+    return set_validator(response, etag), 200
+
+@api_bp.route('/items/<int:item_id>/similar', methods=['GET'])
+def get_similar_items(item_id):
+    """Get precomputed similar and also-rented items for an item"""
+    if db.session.query(Item.id).filter(Item.id == item_id).scalar() is None:
+        abort(404)
+    return jsonify(similar_items(item_id, limit=request.args.get('limit', type=int))), 200
+
+@api_bp.route('/items/<int:item_id>/quote', methods=['POST'])
+def quote_item(item_id):
+    """Price many candidate date ranges at once without booking
+
+    Body: {"ranges": [{"start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD"}, ...]}
+    Quotes come back in request order; a malformed range gets an ``error``
+    instead of a price.
+    """
+    # Imported here so NumPy is only loaded once pricing is used
+    from app.pricing import MAX_QUOTE_RANGES, quote_ranges, to_cents
+    item = Item.query.get_or_404(item_id)
+    ranges = (request.get_json(silent=True) or {}).get('ranges')
+    if not isinstance(ranges, list) or not 1 <= len(ranges) <= MAX_QUOTE_RANGES:
+        return jsonify({'error': f'ranges must be a list of 1-{MAX_QUOTE_RANGES} date ranges'}), 400
+    
+    quotes = [None] * len(ranges)
+    valid, positions = [], []
+    for n, candidate in enumerate(ranges):
+        try:
+            start_date = datetime.strptime(candidate['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(candidate['end_date'], '%Y-%m-%d').date()
+        except (TypeError, KeyError, ValueError):
+            quotes[n] = {'error': 'Invalid date format. Use YYYY-MM-DD'}
+            continue
+        if start_date >= end_date:
+            quotes[n] = {'error': 'End date must be after start date'}
+        elif start_date < date.today():
+            quotes[n] = {'error': 'Start date cannot be in the past'}
+        else:
+            valid.append((start_date, end_date))
+            positions.append(n)
+    
+    if valid:
+        for n, quote in zip(positions, quote_ranges(item, valid)):
+            quotes[n] = quote
+    
+    return jsonify({
+        'item_id': item.id,
+        'daily_rate_cents': to_cents(item.daily_rate),
+        'quotes': quotes
     }), 200
 
 @api_bp.route('/items/<int:item_id>/reviews', methods=['GET'])
 def get_item_reviews(item_id):
-    """Get all reviews for an item"""
-    item = Item.query.get_or_404(item_id)
-    reviews = ItemReview.query.filter_by(item_id=item_id).order_by(ItemReview.created_at.desc()).all()
-    return jsonify({
+    """Get reviews for an item, newest first, paginated by ``before_id``"""
+    version = db.session.query(Item.version).filter(Item.id == item_id).scalar()
+    if version is None:
+        abort(404)
+    # Review writes bump Item.version
+    etag = f'reviews-{item_id}-{version}'
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    reviews, next_before = get_reviews_page(
+        item_id,
+        before_id=request.args.get('before_id', type=int),
+        limit=request.args.get('limit', type=int)
+    )
+    average_rating, rating_count = rating_summary(item_id)
+    response = jsonify({
         'reviews': [{
             'id': r.id,
             'user_id': r.user_id,
@@ -88,9 +262,11 @@ def get_item_reviews(item_id):
             'comment': r.comment or '',
             'created_at': r.created_at.isoformat()
         } for r in reviews],
-        'average_rating': item.average_rating,
-        'rating_count': item.rating_count
-    }), 200
+        'next_before_id': next_before,
+        'average_rating': average_rating,
+        'rating_count': rating_count
+    })
+    return set_validator(response, etag), 200
 
 @api_bp.route('/items/<int:item_id>/reviews', methods=['POST'])
 @login_required
@@ -114,8 +290,9 @@ def create_item_review(item_id):
     if existing:
         existing.rating = rating
         existing.comment = comment or None
+        item.bump_version()
         db.session.commit()
-        db.session.refresh(item)
+        average_rating, rating_count = rating_summary(item_id)
         return jsonify({
             'message': 'Review updated',
             'review': {
@@ -126,13 +303,14 @@ def create_item_review(item_id):
                 'comment': existing.comment or '',
                 'created_at': existing.created_at.isoformat()
             },
-            'average_rating': item.average_rating,
-            'rating_count': item.rating_count
+            'average_rating': average_rating,
+            'rating_count': rating_count
         }), 200
     review = ItemReview(item_id=item_id, user_id=current_user.id, rating=rating, comment=comment or None)
     db.session.add(review)
+    item.bump_version()
     db.session.commit()
-    db.session.refresh(item)
+    average_rating, rating_count = rating_summary(item_id)
     return jsonify({
         'message': 'Review added',
         'review': {
@@ -143,15 +321,19 @@ def create_item_review(item_id):
             'comment': review.comment or '',
             'created_at': review.created_at.isoformat()
         },
-        'average_rating': item.average_rating,
-        'rating_count': item.rating_count
+        'average_rating': average_rating,
+        'rating_count': rating_count
     }), 201
 
 
 @api_bp.route('/items/<int:item_id>/messages', methods=['GET'])
 @login_required
 def get_item_messages(item_id):
-    """Get chat messages for current user and item owner (demo mode)."""
+    """Get chat messages for current user and item owner (demo mode).
+
+    Returns the newest ``limit`` messages in ascending order; pass
+    ``before_id`` to page back through older history.
+    """
     item = Item.query.get_or_404(item_id)
     if current_user.id == item.owner_id:
         other_user_id = request.args.get('with_user_id', type=int)
@@ -160,19 +342,35 @@ def get_item_messages(item_id):
             if latest:
                 other_user_id = latest.sender_id if latest.sender_id != current_user.id else latest.receiver_id
         if not other_user_id:
-            return jsonify({'messages': [], 'other_user_id': None}), 200
+            return jsonify({'messages': [], 'next_before_id': None, 'other_user_id': None}), 200
     else:
         other_user_id = item.owner_id
 
-    messages = ItemMessage.query.filter(
+    limit = page_size(request.args.get('limit', type=int))
+    before_id = request.args.get('before_id', type=int)
+    
+    query = ItemMessage.query.filter(
         ItemMessage.item_id == item_id,
         db.or_(
             db.and_(ItemMessage.sender_id == current_user.id, ItemMessage.receiver_id == other_user_id),
             db.and_(ItemMessage.sender_id == other_user_id, ItemMessage.receiver_id == current_user.id)
         )
-    ).order_by(ItemMessage.created_at.asc()).all()
+    )
+    # Messages are append-only, so count + newest id identify the conversation state
+    count, newest_id = query.with_entities(db.func.count(ItemMessage.id), db.func.max(ItemMessage.id)).one()
+    etag = f'messages-{item_id}-{current_user.id}-{other_user_id}-{count}-{newest_id or 0}'
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    query = query.options(db.joinedload(ItemMessage.sender), db.joinedload(ItemMessage.receiver))
+    if before_id:
+        query = query.filter(ItemMessage.id < before_id)
+    messages = query.order_by(ItemMessage.id.desc()).limit(limit + 1).all()
+    has_more = len(messages) > limit
+    messages = messages[:limit][::-1]
 
-    return jsonify({
+    response = jsonify({
         'messages': [{
             'id': m.id,
             'item_id': m.item_id,
@@ -183,8 +381,10 @@ def get_item_messages(item_id):
             'content': m.content,
             'created_at': m.created_at.isoformat()
         } for m in messages],
+        'next_before_id': messages[0].id if has_more else None,
         'other_user_id': other_user_id
-    }), 200
+    })
+    return set_validator(response, etag), 200
 
 
 @api_bp.route('/items/<int:item_id>/messages', methods=['POST'])
@@ -234,6 +434,100 @@ def create_item_message(item_id):
         }
     }), 201
 
+# Inbox APIs
+@api_bp.route('/inbox', methods=['GET'])
+@login_required
+def get_inbox():
+    """List current user's conversations, newest first, with unread counts.
+
+    One row per (item, counterpart). Paginate with ``before_id`` set to the
+    ``last_message_id`` of the final row of the previous page.
+    """
+    limit = page_size(request.args.get('limit', type=int))
+    before_id = request.args.get('before_id', type=int)
+    
+    # Sent and received messages come from separate index searches on
+    # ix_item_message_sender_item / ix_item_message_receiver_item
+    sent = db.select(
+        ItemMessage.item_id.label('item_id'),
+        ItemMessage.receiver_id.label('other_user_id'),
+        ItemMessage.id.label('id'),
+        db.literal(0).label('unread')
+    ).where(ItemMessage.sender_id == current_user.id)
+    received = db.select(
+        ItemMessage.item_id,
+        ItemMessage.sender_id,
+        ItemMessage.id,
+        db.case((ItemMessage.is_read == False, 1), else_=0)
+    ).where(ItemMessage.receiver_id == current_user.id)
+    messages = db.union_all(sent, received).subquery()
+    
+    last_id = db.func.max(messages.c.id)
+    conversations = db.select(
+        messages.c.item_id,
+        messages.c.other_user_id,
+        last_id.label('last_id'),
+        db.func.sum(messages.c.unread).label('unread_count')
+    ).group_by(messages.c.item_id, messages.c.other_user_id)
+    if before_id:
+        conversations = conversations.having(last_id < before_id)
+    conversations = conversations.subquery()
+    
+    rows = db.session.query(conversations, ItemMessage, Item.name, User.full_name).join(
+        ItemMessage, ItemMessage.id == conversations.c.last_id
+    ).join(
+        Item, Item.id == conversations.c.item_id
+    ).join(
+        User, User.id == conversations.c.other_user_id
+    ).order_by(conversations.c.last_id.desc()).limit(limit + 1).all()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    return jsonify({
+        'conversations': [{
+            'item_id': row.item_id,
+            'item_name': row.name,
+            'other_user_id': row.other_user_id,
+            'other_user_name': row.full_name,
+            'last_message_id': row.last_id,
+            'last_message': row.ItemMessage.content,
+            'last_message_sender_id': row.ItemMessage.sender_id,
+            'last_message_at': row.ItemMessage.created_at.isoformat(),
+            'unread_count': int(row.unread_count or 0)
+        } for row in rows],
+        'next_before_id': rows[-1].last_id if has_more else None
+    }), 200
+
+@api_bp.route('/inbox/read', methods=['POST'])
+@login_required
+def mark_inbox_read():
+    """Mark messages received in one or more conversations as read."""
+    data = request.get_json() or {}
+    conversations = data.get('conversations')
+    
+    if not isinstance(conversations, list) or not conversations:
+        return jsonify({'error': 'conversations must be a non-empty list'}), 400
+    
+    targets = set()
+    for conversation in conversations:
+        try:
+            targets.add((int(conversation['item_id']), int(conversation['with_user_id'])))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Each conversation needs item_id and with_user_id'}), 400
+    
+    updated = 0
+    for item_id, other_user_id in targets:
+        updated += ItemMessage.query.filter(
+            ItemMessage.receiver_id == current_user.id,
+            ItemMessage.is_read == False,
+            ItemMessage.item_id == item_id,
+            ItemMessage.sender_id == other_user_id
+        ).update({'is_read': True}, synchronize_session=False)
+    db.session.commit()
+    
+    return jsonify({'message': 'Messages marked as read', 'updated': updated}), 200
+
 @api_bp.route('/items', methods=['POST'])
 @login_required
 def create_item():
@@ -310,7 +604,14 @@ def update_item(item_id):
         item.location = data['location']
     if 'is_available' in data:
         item.is_available = data['is_available']
+    for field in ('weekend_surcharge_pct', 'weekly_discount_pct', 'monthly_discount_pct'):
+        if field in data:
+            value = data[field]
+            if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 100:
+                return jsonify({'error': f'{field} must be a whole percent from 0 to 100'}), 400
+            setattr(item, field, value)
     
+    item.bump_version()
     db.session.commit()
     
     return jsonify({'message': 'Item updated successfully'}), 200
@@ -332,7 +633,8 @@ def delete_item(item_id):
         except:
             pass
     
-    db.session.delete(item)
+    Item.purge([item.id])
+    db.session.expunge(item)
     db.session.commit()
     
     return jsonify({'message': 'Item deleted successfully'}), 200
@@ -371,19 +673,15 @@ def create_rental():
     if start_date < date.today():
         return jsonify({'error': 'Start date cannot be in the past'}), 400
     
-    # Check for overlapping rentals
-    overlapping = Rental.query.filter(
-        Rental.item_id == item_id,
-        Rental.status.in_(['pending', 'confirmed']),
-        Rental.start_date <= end_date,
-        Rental.end_date >= start_date
-    ).first()
+    # Same integer-cent pricing and overlap check as the quote endpoint
+    from app.pricing import quote_ranges
+    quote = quote_ranges(item, [(start_date, end_date)])[0]
     
-    if overlapping:
+    if not quote['available']:
         return jsonify({'error': 'Item is already booked for these dates'}), 400
     
-    total_days = (end_date - start_date).days
-    total_amount = item.daily_rate * total_days
+    total_days = quote['total_days']
+    total_amount = quote['total_amount']
     
     rental = Rental(
         item_id=item_id,
@@ -396,6 +694,7 @@ def create_rental():
     )
     
     db.session.add(rental)
+    item.bump_version()
     db.session.commit()
     
     return jsonify({
@@ -415,23 +714,34 @@ def create_rental():
 @api_bp.route('/rentals', methods=['GET'])
 @login_required
 def get_rentals():
-    """Get rentals for current user"""
+    """Get rentals for current user, or specific rentals by ``ids``"""
     role = request.args.get('role', 'renter')  # 'renter' or 'owner'
+    ids = None
     
-    if role == 'owner':
-        # Get items owned by user
-        owned_items = Item.query.filter_by(owner_id=current_user.id).all()
-        owned_item_ids = [item.id for item in owned_items]
-        
-        if not owned_item_ids:
-            return jsonify({'rentals': []}), 200
-        
-        rentals = Rental.query.filter(Rental.item_id.in_(owned_item_ids)).all()
+    query = Rental.query.join(Item, Item.id == Rental.item_id).options(
+        db.contains_eager(Rental.item),
+        db.joinedload(Rental.renter)
+    )
+    
+    if request.args.get('ids'):
+        try:
+            ids = parse_ids(request.args['ids'])
+        except ValueError:
+            return jsonify({'error': f'ids must be 1-{MAX_PAGE_SIZE} comma-separated integers'}), 400
+        # Either side of the rental may fetch it
+        query = query.filter(
+            Rental.id.in_(ids),
+            db.or_(Rental.renter_id == current_user.id, Item.owner_id == current_user.id)
+        )
+    elif role == 'owner':
+        query = query.filter(Item.owner_id == current_user.id)
     else:
         # Get rentals where user is renter
-        rentals = Rental.query.filter_by(renter_id=current_user.id).all()
+        query = query.filter(Rental.renter_id == current_user.id)
     
-    return jsonify({
+    rentals = query.all()
+    
+    payload = {
         'rentals': [{
             'id': rental.id,
             'item_id': rental.item_id,
@@ -445,7 +755,13 @@ def get_rentals():
             'status': rental.status,
             'created_at': rental.created_at.isoformat()
         } for rental in rentals]
-    }), 200
+    }
+    if ids is not None:
+        position = {rental_id: n for n, rental_id in enumerate(ids)}
+        payload['rentals'].sort(key=lambda rental: position[rental['id']])
+        found = {rental.id for rental in rentals}
+        payload['not_found'] = [rental_id for rental_id in ids if rental_id not in found]
+    return jsonify(payload), 200
 
 @api_bp.route('/rentals/<int:rental_id>', methods=['GET'])
 @login_required
@@ -492,6 +808,8 @@ def update_rental_status(rental_id):
         return jsonify({'error': 'Invalid status'}), 400
     
     rental.status = new_status
+    rental.item.bump_version()
+    refresh_rental_rollups(rental)
     db.session.commit()
     
     return jsonify({'message': 'Rental status updated successfully'}), 200
@@ -537,6 +855,8 @@ def create_payment():
     
     # Update rental status to confirmed
     rental.status = 'confirmed'
+    rental.item.bump_version()
+    refresh_rental_rollups(rental)
     
     db.session.commit()
     
@@ -603,6 +923,254 @@ def get_dashboard_stats():
         'pending_rentals_as_renter': len([r for r in rentals_as_renter if r.status == 'pending'])
     }), 200
 
+@api_bp.route('/analytics/earnings', methods=['GET'])
+@login_required
+def get_earnings():
+    """Revenue, occupancy and bookings per item per day/week/month for the current owner"""
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': 'granularity must be one of: ' + ', '.join(GRANULARITIES)}), 400
+    
+    try:
+        to_date = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else date.today()
+        from_date = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else to_date - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    if from_date > to_date:
+        return jsonify({'error': 'from must not be after to'}), 400
+    
+    period = period_expression(granularity)
+    query = db.session.query(
+        ItemDailyRollup.item_id,
+        period.label('period'),
+        db.func.sum(ItemDailyRollup.revenue),
+        db.func.sum(ItemDailyRollup.booked),
+        db.func.sum(ItemDailyRollup.bookings)
+    ).filter(
+        ItemDailyRollup.owner_id == current_user.id,
+        ItemDailyRollup.day >= from_date,
+        ItemDailyRollup.day <= to_date
+    )
+    item_id = request.args.get('item_id', type=int)
+    if item_id:
+        query = query.filter(ItemDailyRollup.item_id == item_id)
+    rows = query.group_by(ItemDailyRollup.item_id, period).order_by(ItemDailyRollup.item_id, period).all()
+    
+    items = {}
+    totals = {}
+    for row_item_id, period_start, revenue, booked, bookings in rows:
+        days = period_days(granularity, date.fromisoformat(period_start), from_date, to_date)
+        items.setdefault(row_item_id, []).append({
+            'period': period_start,
+            'revenue': round(revenue, 2),
+            'booked_days': booked,
+            'occupancy_rate': round(min(booked / days, 1.0), 4),
+            'bookings': bookings
+        })
+        total = totals.setdefault(period_start, {'period': period_start, 'revenue': 0.0, 'bookings': 0})
+        total['revenue'] = round(total['revenue'] + revenue, 2)
+        total['bookings'] += bookings
+    
+    return jsonify({
+        'granularity': granularity,
+        'from': from_date.isoformat(),
+        'to': to_date.isoformat(),
+        'items': [{'item_id': k, 'series': v} for k, v in items.items()],
+        'totals': [totals[k] for k in sorted(totals)]
+    }), 200
+
+# Bulk import/export APIs
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+def export_response(statement, fields, name):
+    """Stream a select as CSV or NDJSON, chosen by ``format``"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in bulk.FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    
+    response = Response(
+        stream_with_context(bulk.stream_rows(statement, fields, fmt)),
+        mimetype=EXPORT_MIMETYPES[fmt]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{fmt}'
+    return response
+
+@api_bp.route('/items/import', methods=['POST'])
+@login_required
+def import_items():
+    """Create listings from a CSV or NDJSON file, with an optional zip of images
+
+    Rows are validated one at a time and valid rows are inserted in batches;
+    rows that fail are reported by row number and skipped.
+    """
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({'error': 'No import file provided'}), 400
+    
+    fmt = bulk.detect_format(file.filename, request.form.get('format'))
+    if fmt is None:
+        return jsonify({'error': 'Import file must be .csv or .ndjson'}), 400
+    
+    images = request.files.get('images')
+    try:
+        result = bulk.import_items(
+            file.stream, fmt, current_user.id,
+            images.stream if images and images.filename else None,
+            allowed_file
+        )
+    except zipfile.BadZipFile:
+        return jsonify({'error': 'images must be a zip file'}), 400
+    
+    return jsonify(result), 200
+
+@api_bp.route('/items/export', methods=['GET'])
+@login_required
+def export_items():
+    """Stream the current user's listings"""
+    statement = db.select(
+        Item.id, Item.name, Item.description, Item.category, Item.daily_rate,
+        Item.location, Item.is_available, Item.image_path, Item.created_at
+    ).where(Item.owner_id == current_user.id).order_by(Item.id)
+    return export_response(statement, bulk.ITEM_EXPORT_FIELDS, 'items')
+
+@api_bp.route('/rentals/export', methods=['GET'])
+@login_required
+def export_rentals():
+    """Stream the current user's rentals, as renter or owner"""
+    statement = db.select(
+        Rental.id, Rental.item_id, Item.name, Rental.renter_id, User.full_name,
+        Rental.start_date, Rental.end_date, Rental.total_days, Rental.total_amount,
+        Rental.status, Rental.created_at
+    ).join(Item, Item.id == Rental.item_id).join(User, User.id == Rental.renter_id).order_by(Rental.id)
+    if request.args.get('role', 'renter') == 'owner':
+        statement = statement.where(Item.owner_id == current_user.id)
+    else:
+        statement = statement.where(Rental.renter_id == current_user.id)
+    return export_response(statement, bulk.RENTAL_EXPORT_FIELDS, 'rentals')
+
+# Batch API
+@api_bp.route('/batch', methods=['POST'])
+@login_required
+def batch():
+    """Run several API operations in one transaction and round trip
+
+    Body: {"operations": [{"method": "PUT", "path": "/api/items/1", "body": {...}}, ...]}
+    """
+    data = request.get_json() or {}
+    operations = data.get('operations')
+    error = validate_operations(operations)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    committed, results = run_batch(operations)
+    if not committed:
+        return jsonify({'error': 'Batch rolled back', 'committed': False, 'results': results}), 400
+    return jsonify({'committed': True, 'results': results}), 200
+
+# Sync API
+@api_bp.route('/sync', methods=['GET'])
+@login_required
+def sync():
+    """Changes since a cursor for the current user's scope
+
+    Scope: all items (the public catalog), rentals the user is renter or
+    owner of, reviews by the user or on their items, and messages they sent
+    or received. Omit ``since`` for a full initial sync, then pass back the
+    returned ``cursor``; repeat while ``has_more`` is true.
+    """
+    try:
+        positions = decode_cursor(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'Invalid since cursor'}), 400
+    limit = page_size(request.args.get('limit', type=int))
+    
+    owned_item_ids = db.session.query(Item.id).filter(Item.owner_id == current_user.id)
+    sources = {
+        'items': (Item, Item.query.options(db.joinedload(Item.owner))),
+        'rentals': (Rental, Rental.query.options(db.joinedload(Rental.item), db.joinedload(Rental.renter)).filter(
+            db.or_(Rental.renter_id == current_user.id, Rental.item_id.in_(owned_item_ids))
+        )),
+        'reviews': (ItemReview, ItemReview.query.options(db.joinedload(ItemReview.user)).filter(
+            db.or_(ItemReview.user_id == current_user.id, ItemReview.item_id.in_(owned_item_ids))
+        )),
+        'messages': (ItemMessage, ItemMessage.query.filter(
+            db.or_(ItemMessage.sender_id == current_user.id, ItemMessage.receiver_id == current_user.id)
+        )),
+        'deleted': (Tombstone, Tombstone.query),
+    }
+    changes = {}
+    has_more = False
+    for entity, (model, query) in sources.items():
+        rows, position, more = changed_since(query, model, positions.get(entity), limit)
+        changes[entity] = rows
+        if position:
+            positions[entity] = position
+        has_more = has_more or more
+    
+    ratings = rating_summaries([item.id for item in changes['items']]) if changes['items'] else {}
+    
+    return jsonify({
+        'items': [{
+            'id': item.id,
+            'name': item.name,
+            'description': item.description,
+            'category': item.category,
+            'daily_rate': item.daily_rate,
+            'image_path': item.image_path,
+            'location': item.location,
+            'is_available': item.is_available,
+            'owner_id': item.owner_id,
+            'owner_name': item.owner.full_name,
+            'average_rating': ratings.get(item.id, (None, 0))[0],
+            'rating_count': ratings.get(item.id, (None, 0))[1],
+            'version': item.version,
+            'created_at': item.created_at.isoformat(),
+            'updated_at': item.updated_at.isoformat()
+        } for item in changes['items']],
+        'rentals': [{
+            'id': rental.id,
+            'item_id': rental.item_id,
+            'item_name': rental.item.name,
+            'renter_id': rental.renter_id,
+            'renter_name': rental.renter.full_name,
+            'start_date': rental.start_date.isoformat(),
+            'end_date': rental.end_date.isoformat(),
+            'total_days': rental.total_days,
+            'total_amount': rental.total_amount,
+            'status': rental.status,
+            'created_at': rental.created_at.isoformat(),
+            'updated_at': rental.updated_at.isoformat()
+        } for rental in changes['rentals']],
+        'reviews': [{
+            'id': r.id,
+            'item_id': r.item_id,
+            'user_id': r.user_id,
+            'user_name': r.user.full_name,
+            'rating': r.rating,
+            'comment': r.comment or '',
+            'created_at': r.created_at.isoformat(),
+            'updated_at': r.updated_at.isoformat()
+        } for r in changes['reviews']],
+        'messages': [{
+            'id': m.id,
+            'item_id': m.item_id,
+            'sender_id': m.sender_id,
+            'receiver_id': m.receiver_id,
+            'content': m.content,
+            'is_read': m.is_read,
+            'created_at': m.created_at.isoformat(),
+            'updated_at': m.updated_at.isoformat()
+        } for m in changes['messages']],
+        'deleted': [{
+            'entity': t.entity,
+            'id': t.entity_id,
+            'deleted_at': t.updated_at.isoformat()
+        } for t in changes['deleted']],
+        'cursor': encode_cursor(positions),
+        'has_more': has_more
+    }), 200
+
 @api_bp.route('/categories', methods=['GET'])
 def get_categories():
     """Get list of available categories"""
@@ -0,0 +1,97 @@
+"""Run several API sub-requests in one database transaction.
+
+Each operation is dispatched through the normal Flask routing, with the
+caller's cookies, inside the current app context. While the batch runs,
+db.session is swapped for a BatchSession whose commit() only flushes, so
+the views' own commits are deferred. The batch commits once if every
+operation succeeds and rolls back otherwise.
+
+Side effects outside the database (e.g. image files removed by
+delete_item) are not rolled back.
+"""
+from flask import current_app, request
+from flask_sqlalchemy.session import Session
+from werkzeug.test import EnvironBuilder
+
+from app import db
+
+MAX_BATCH_OPERATIONS = 20
+BATCH_METHODS = {'GET', 'POST', 'PUT', 'DELETE'}
+
+
+class BatchSession(Session):
+    """Session that defers commits to the end of the batch."""
+
+    def commit(self):
+        self.flush()
+
+
+def validate_operations(operations):
+    """Return an error message for a malformed operations list, or None."""
+    if not isinstance(operations, list) or not operations:
+        return 'operations must be a non-empty list'
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return f'At most {MAX_BATCH_OPERATIONS} operations per batch'
+    for n, op in enumerate(operations):
+        if not isinstance(op, dict):
+            return f'Operation {n} must be an object'
+        if str(op.get('method', 'GET')).upper() not in BATCH_METHODS:
+            return f'Operation {n} has an unsupported method'
+        path = op.get('path')
+        if not isinstance(path, str) or not path.startswith('/api/') or path.split('?')[0].rstrip('/') == '/api/batch':
+            return f'Operation {n} must target an /api/ path other than /api/batch'
+    return None
+
+
+def _dispatch(op):
+    path, _, query_string = op['path'].partition('?')
+    builder = EnvironBuilder(
+        path=path,
+        query_string=query_string,
+        method=str(op.get('method', 'GET')).upper(),
+        json=op.get('body'),
+        headers={'Cookie': request.headers.get('Cookie', '')},
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    with current_app.request_context(environ):
+        return current_app.full_dispatch_request()
+
+
+def run_batch(operations):
+    """Run operations in order; stop at the first failure and roll back.
+
+    Returns (committed, results) where results has one entry per operation.
+    """
+    previous = db.session()
+    batch_session = BatchSession(db=db, query_cls=db.Query)
+    db.session.registry.set(batch_session)
+    results = []
+    failed = False
+    try:
+        for op in operations:
+            if failed:
+                results.append({'status': None, 'skipped': True})
+                continue
+            try:
+                response = _dispatch(op)
+                status = response.status_code
+                body = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+            except Exception:
+                current_app.logger.exception('Batch operation failed: %s %s', op.get('method'), op.get('path'))
+                status, body = 500, {'error': 'Internal server error'}
+            results.append({'status': status, 'body': body})
+            failed = status >= 400
+        if failed:
+            batch_session.rollback()
+        else:
+            Session.commit(batch_session)
+    except Exception:
+        batch_session.rollback()
+        raise
+    finally:
+        batch_session.close()
+        db.session.registry.set(previous)
+    return not failed, results
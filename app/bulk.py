@@ -0,0 +1,261 @@
+"""Streaming CSV / NDJSON import and export of listings and rentals.
+
+Imports read the upload row by row, validate each row on its own and insert
+valid rows in batches of IMPORT_BATCH, one transaction per batch, so memory
+and transaction size stay bounded. Exports stream rows from a yield_per
+cursor, so memory is constant regardless of row count.
+"""
+import codecs
+import csv
+import json
+import math
+import os
+import zipfile
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.models import Item
+
+IMPORT_BATCH = 500
+IMPORT_READ_SIZE = 64 * 1024
+EXPORT_BATCH = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ('csv', 'ndjson')
+
+ITEM_EXPORT_FIELDS = ['id', 'name', 'description', 'category', 'daily_rate', 'location', 'is_available', 'image_path', 'created_at']
+RENTAL_EXPORT_FIELDS = ['id', 'item_id', 'item_name', 'renter_id', 'renter_name', 'start_date', 'end_date',
+                        'total_days', 'total_amount', 'status', 'created_at']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+
+def detect_format(filename, requested=None):
+    if requested:
+        return requested if requested in FORMATS else None
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        return 'csv'
+    if extension in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    return None
+
+
+def _text_lines(stream):
+    """Decode an upload line by line, keeping line endings; only needs stream.read().
+
+    The bytes are split on newlines before decoding, so a UnicodeDecodeError is
+    raised for the line holding the bad byte, not a read buffer ahead of it.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = b''
+    while True:
+        chunk = stream.read(IMPORT_READ_SIZE)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield decoder.decode(line + b'\n')
+    last = decoder.decode(pending, final=True)
+    if last:
+        yield last
+
+
+def read_rows(stream, fmt):
+    """Yield (row_number, dict_or_error) from an uploaded stream, one row at a time."""
+    text = _text_lines(stream)
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            yield number, row
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            yield number, 'Invalid JSON'
+            continue
+        yield number, row if isinstance(row, dict) else 'Each line must be a JSON object'
+
+
+def _extract_image(images, name, allowed_file):
+    """Copy one image out of the zip into the upload folder; returns the stored filename."""
+    if images is None:
+        raise ValueError('image given but no images zip uploaded')
+    try:
+        info = images.getinfo(name)
+    except KeyError:
+        raise ValueError(f'image {name!r} not found in zip')
+    if not allowed_file(name):
+        raise ValueError('Invalid image file type')
+    if info.file_size > current_app.config['MAX_CONTENT_LENGTH']:
+        raise ValueError('Image too large')
+    filename = datetime.now().strftime('%Y%m%d_%H%M%S_') + secure_filename(os.path.basename(name))
+    with images.open(info) as source, open(os.path.join(current_app.config['UPLOAD_FOLDER'], filename), 'wb') as target:
+        while True:
+            chunk = source.read(64 * 1024)
+            if not chunk:
+                break
+            target.write(chunk)
+    return filename
+
+
+def _text(row, field):
+    """A text column; missing or null is ''. NDJSON values must be strings."""
+    value = row.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f'{field} must be a string')
+    return value
+
+
+def validate_item_row(row, owner_id, images, allowed_file):
+    """Return column values for an Item insert; raises ValueError with a message."""
+    name = _text(row, 'name').strip()
+    category = _text(row, 'category').strip()
+    if not name or not category:
+        raise ValueError('name and category are required')
+    daily_rate = row.get('daily_rate')
+    if isinstance(daily_rate, bool):
+        raise ValueError('daily_rate must be a number')
+    try:
+        daily_rate = float(daily_rate)
+    except (TypeError, ValueError):
+        raise ValueError('daily_rate must be a number')
+    if not math.isfinite(daily_rate) or daily_rate <= 0:
+        raise ValueError('daily_rate must be a positive number')
+    # Missing, null and empty all mean available; a short CSV row fills missing columns with None
+    is_available = row.get('is_available')
+    if is_available is None:
+        is_available = True
+    elif isinstance(is_available, str):
+        value = is_available.strip().lower()
+        if not value or value in TRUE_VALUES:
+            is_available = True
+        elif value in FALSE_VALUES:
+            is_available = False
+        else:
+            raise ValueError('is_available must be true or false')
+    elif not isinstance(is_available, bool):
+        raise ValueError('is_available must be true or false')
+    image = _text(row, 'image').strip()
+    return {
+        'name': name,
+        'description': _text(row, 'description'),
+        'category': category,
+        'daily_rate': daily_rate,
+        'location': _text(row, 'location'),
+        'is_available': is_available,
+        'image_path': _extract_image(images, image, allowed_file) if image else None,
+        'owner_id': owner_id,
+    }
+
+
+def import_items(stream, fmt, owner_id, images_stream, allowed_file):
+    """Import listings; returns {'imported', 'failed', 'errors'}."""
+    images = zipfile.ZipFile(images_stream) if images_stream is not None else None
+    imported = failed = 0
+    errors = []
+    batch = []
+    batch_rows = []
+
+    def flush():
+        nonlocal imported
+        if not batch:
+            return
+        try:
+            db.session.execute(db.insert(Item), batch)
+            db.session.commit()
+            imported += len(batch)
+        except SQLAlchemyError:
+            # Retry row by row so one bad row only loses itself
+            db.session.rollback()
+            for number, values in zip(batch_rows, batch):
+                try:
+                    db.session.execute(db.insert(Item), [values])
+                    db.session.commit()
+                    imported += 1
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    report(number, f'Could not be saved: {getattr(e, "orig", e)}')
+        batch.clear()
+        batch_rows.clear()
+
+    def report(number, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'row': number, 'error': message})
+
+    number = 0
+    try:
+        for number, row in read_rows(stream, fmt):
+            try:
+                if isinstance(row, str):
+                    raise ValueError(row)
+                batch.append(validate_item_row(row, owner_id, images, allowed_file))
+                batch_rows.append(number)
+            except ValueError as e:
+                report(number, str(e))
+                continue
+            if len(batch) >= IMPORT_BATCH:
+                flush()
+        flush()
+    except (UnicodeDecodeError, csv.Error):
+        # Rows are decoded one line at a time, so the error is in the row after the last one read
+        flush()
+        report(number + 1, 'Unreadable file from this row on; must be UTF-8 CSV or NDJSON')
+    finally:
+        if images is not None:
+            images.close()
+    return {'imported': imported, 'failed': failed, 'errors': errors}
+
+
+class _Line:
+    """File-like sink that hands back what csv.writer writes."""
+
+    def write(self, value):
+        return value
+
+
+def _serialize(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _lines(result, fields, fmt):
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(fields)
+        for row in result:
+            yield writer.writerow([_serialize(value) for value in row])
+    else:
+        for row in result:
+            yield json.dumps(dict(zip(fields, (_serialize(value) for value in row)))) + '\n'
+
+
+def stream_rows(statement, fields, fmt):
+    """Yield an export body from a select, fetching EXPORT_BATCH rows at a time.
+
+    Lines are grouped into chunks of about EXPORT_CHUNK_SIZE characters, so
+    the server and the compressor see a few large writes, not one per row.
+    """
+    result = db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH))
+    chunk, size = [], 0
+    for line in _lines(result, fields, fmt):
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk)
@@ -0,0 +1,134 @@
+"""In-process caches for rendered HTML and conditional GET helpers.
+
+Fragments (item cards, item-detail blocks) are keyed by item id and
+Item.version, so a bumped version makes old entries unreachable and they
+age out of the LRU. Full anonymous pages are cached for PAGE_CACHE_TTL
+seconds and served with an ETag so browsers can revalidate with a 304.
+
+Each gunicorn worker keeps its own caches; writes clear the local page
+cache immediately, other workers catch up within the TTL.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+
+
+class TTLCache:
+    """Thread-safe LRU cache with optional per-entry expiry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, factory, ttl=None):
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def init_app(app):
+    app.config.setdefault('PAGE_CACHE_TTL', 30)
+    app.config.setdefault('FRAGMENT_CACHE_SIZE', 4096)
+    app.config.setdefault('PAGE_CACHE_SIZE', 256)
+    app.extensions['fragment_cache'] = TTLCache(app.config['FRAGMENT_CACHE_SIZE'])
+    app.extensions['page_cache'] = TTLCache(app.config['PAGE_CACHE_SIZE'])
+
+
+def fragments():
+    """The current app's rendered-fragment cache."""
+    return current_app.extensions['fragment_cache']
+
+
+def clear_pages():
+    current_app.extensions['page_cache'].clear()
+
+
+def matching_etag(etag):
+    """The variant of a strong ETag the client sent in If-None-Match, if any.
+
+    Compressed responses carry ``<etag>-<encoding>`` (see app.compression).
+    """
+    for candidate in (etag, f'{etag}-gzip', f'{etag}-br'):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+
+def not_modified(etag):
+    """Return a 304 response if the client already has etag, else None.
+
+    Call before building the response body so a match skips serialization.
+    """
+    matched = matching_etag(etag)
+    if matched is None:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(matched)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def set_validator(response, etag):
+    """Attach a strong ETag and require revalidation on every use."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_page(view):
+    """Cache a view's full response for anonymous GETs, with ETag/304 handling."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        ttl = current_app.config['PAGE_CACHE_TTL']
+        if not ttl or current_user.is_authenticated or '_flashes' in session:
+            return view(*args, **kwargs)
+        cache = current_app.extensions['page_cache']
+        key = request.full_path
+        cached = cache.get(key)
+        if cached is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            cached = (body, hashlib.sha1(body).hexdigest(), response.mimetype)
+            cache.set(key, cached, ttl)
+        body, etag, mimetype = cached
+        response = not_modified(etag) or set_validator(
+            current_app.response_class(body, mimetype=mimetype), etag
+        )
+        response.vary.add('Cookie')
+        return response
+    return wrapper
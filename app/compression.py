@@ -0,0 +1,107 @@
+"""Negotiated gzip/brotli response compression.
+
+Registered as an app-wide after_request hook. Buffered responses are only
+compressed above COMPRESS_MIN_SIZE bytes. Streamed responses are fed to one
+compressor as they are produced and sync-flushed every
+COMPRESS_STREAM_FLUSH_SIZE input bytes (and at the end), so clients get
+data progressively without paying a flush per small chunk. Brotli is used when the ``brotli`` package is
+installed and the client prefers or accepts it.
+
+A strong ETag on a compressed response gets an ``-<encoding>`` suffix,
+since it now identifies a different byte sequence; app.cache.not_modified
+accepts any of the suffixed forms.
+"""
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+}
+
+
+def init_app(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+    app.config.setdefault('COMPRESS_STREAM_FLUSH_SIZE', 32 * 1024)
+    app.after_request(compress_response)
+
+
+def _compressor(encoding, config):
+    if encoding == 'br':
+        return brotli.Compressor(quality=config['COMPRESS_BROTLI_QUALITY'])
+    return zlib.compressobj(config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)
+
+
+def compress(data, encoding, config):
+    """Compress a complete body in one call."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    compressor = _compressor(encoding, config)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, config):
+    """Compress an iterable of chunks, flushing every COMPRESS_STREAM_FLUSH_SIZE input bytes."""
+    compressor = _compressor(encoding, config)
+    flush_size = config['COMPRESS_STREAM_FLUSH_SIZE']
+    pending = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.process(chunk) if encoding == 'br' else compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            data += compressor.flush() if encoding == 'br' else compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if data:
+            yield data
+    yield compressor.finish() if encoding == 'br' else compressor.flush()
+
+
+def compress_response(response):
+    if (request.method == 'HEAD'
+            or response.direct_passthrough
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    config = current_app.config
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, config)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        compressed = compress(data, encoding, config)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
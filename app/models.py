@@ -34,11 +34,20 @@ class Item(db.Model):
     description = db.Column(db.Text)
     category = db.Column(db.String(50), nullable=False)  # camera, bike, car, printer, etc.
     daily_rate = db.Column(db.Float, nullable=False)
+    # Pricing rules, in whole percent (see app.pricing)
+    weekend_surcharge_pct = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    weekly_discount_pct = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    monthly_discount_pct = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     image_path = db.Column(db.String(255))
     location = db.Column(db.String(200))
     is_available = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # bumped on any change shown on item pages
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True, info={'backfill': 'created_at'})
+    
+    # Never reuse the id of a deleted item: caches and ETags key on (id, version)
+    __table_args__ = {'sqlite_autoincrement': True}
     
     # Relationships
     rentals = db.relationship('Rental', backref='item', lazy=True, cascade='all, delete-orphan')
@@ -55,6 +64,38 @@ class Item(db.Model):
     def rating_count(self):
         return len(self.reviews)
     
+    def bump_version(self):
+        """Invalidate cached fragments for this item (see app.cache)."""
+        self.version = Item.version + 1
+    
+    @staticmethod
+    def purge(item_ids):
+        """Delete items and everything hanging off them with set-based DELETEs.
+
+        item_ids may be a list or a select of ids (e.g. all items of a user).
+        Unlike session.delete(), no child rows are loaded into the session, so
+        the cost does not grow with the number of rentals/reviews/messages.
+        Writes tombstones for delta sync. Does not commit.
+        """
+        rental_ids = db.select(Rental.id).where(Rental.item_id.in_(item_ids))
+        db.session.execute(
+            db.insert(Tombstone).from_select(
+                ['entity', 'entity_id', 'updated_at'],
+                db.select(db.literal('item'), Item.id, db.literal(datetime.utcnow())).where(Item.id.in_(item_ids))
+            )
+        )
+        for statement in (
+            db.delete(Payment).where(Payment.rental_id.in_(rental_ids)),
+            db.delete(Rental).where(Rental.item_id.in_(item_ids)),
+            db.delete(ItemReview).where(ItemReview.item_id.in_(item_ids)),
+            db.delete(ItemMessage).where(ItemMessage.item_id.in_(item_ids)),
+            db.delete(ItemSimilarity).where(db.or_(ItemSimilarity.item_id.in_(item_ids), ItemSimilarity.neighbor_id.in_(item_ids))),
+            db.delete(ItemSimilarityState).where(ItemSimilarityState.item_id.in_(item_ids)),
+            db.delete(ItemDailyRollup).where(ItemDailyRollup.item_id.in_(item_ids)),
+            db.delete(Item).where(Item.id.in_(item_ids)),
+        ):
+            db.session.execute(statement, execution_options={'synchronize_session': False})
+    
     def __repr__(self):
         return f'<Item {self.name}>'
 
@@ -67,6 +108,7 @@ class ItemReview(db.Model):
     rating = db.Column(db.Integer, nullable=False)  # 1-5
     comment = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True, info={'backfill': 'created_at'})
     
     __table_args__ = (db.UniqueConstraint('item_id', 'user_id', name='unique_item_user_review'),)
     
@@ -80,19 +122,26 @@ class ItemReview(db.Model):
 class ItemMessage(db.Model):
     """Chat message between two users about a specific item."""
     id = db.Column(db.Integer, primary_key=True)
-    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False, index=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     is_read = db.Column(db.Boolean, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True, info={'backfill': 'created_at'})
+    
+    __table_args__ = (
+        # Covering indexes for the two halves of the inbox query
+        db.Index('ix_item_message_sender_item', 'sender_id', 'item_id', 'receiver_id'),
+        db.Index('ix_item_message_receiver_item', 'receiver_id', 'item_id', 'sender_id', 'is_read'),
+    )
     
     def __repr__(self):
         return f'<ItemMessage item={self.item_id} from={self.sender_id} to={self.receiver_id}>'
 
 class Rental(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False, index=True)
     renter_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date, nullable=False)
@@ -100,6 +149,7 @@ class Rental(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, confirmed, completed, cancelled
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True, info={'backfill': 'created_at'})
     
     # Relationships
     payment = db.relationship('Payment', backref='rental', uselist=False, cascade='all, delete-orphan')
@@ -109,7 +159,7 @@ class Rental(db.Model):
 
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    rental_id = db.Column(db.Integer, db.ForeignKey('rental.id'), nullable=False)
+    rental_id = db.Column(db.Integer, db.ForeignKey('rental.id'), nullable=False, index=True)
     amount = db.Column(db.Float, nullable=False)
     payment_method = db.Column(db.String(50), default='card')  # card, bank_transfer, etc.
     transaction_id = db.Column(db.String(100))
@@ -119,3 +169,63 @@ class Payment(db.Model):
     def __repr__(self):
         return f'<Payment {self.id}>'
 
+
+class ItemSimilarity(db.Model):
+    """Precomputed neighbour of an item, written by the recommendations job.
+
+    kind is 'similar' (co-rentals/co-reviews blended with category and price)
+    or 'also_rented' (co-rentals only); rank 0 is the closest neighbour.
+    """
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False, index=True)  # for Item.purge
+    score = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<ItemSimilarity {self.kind} item={self.item_id} #{self.rank}={self.neighbor_id}>'
+
+
+class ItemSimilarityState(db.Model):
+    """Activity signature an item's neighbours were last computed from."""
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), primary_key=True)
+    signature = db.Column(db.String(40), nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<ItemSimilarityState item={self.item_id}>'
+
+
+class ItemDailyRollup(db.Model):
+    """Per-item, per-day earnings rollup of confirmed/completed rentals.
+
+    Each rental's total_amount is split in whole cents over the days it
+    covers (start_date inclusive, end_date exclusive), leftover cents on the
+    first days. Maintained by app.analytics.
+    """
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    booked = db.Column(db.Integer, nullable=False, default=0)  # rentals covering this day
+    bookings = db.Column(db.Integer, nullable=False, default=0)  # rentals starting this day
+    
+    __table_args__ = (db.Index('ix_item_daily_rollup_owner_day', 'owner_id', 'day'),)
+    
+    def __repr__(self):
+        return f'<ItemDailyRollup item={self.item_id} day={self.day}>'
+
+
+class Tombstone(db.Model):
+    """Record of a deleted row, so delta-sync clients can drop it.
+
+    Deleting an item also removes its rentals, reviews and messages; only the
+    item gets a tombstone and clients cascade locally.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # item
+    entity_id = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<Tombstone {self.entity} {self.entity_id}>'
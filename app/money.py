@@ -0,0 +1,16 @@
+"""Exact money helpers: amounts are handled as integer cents."""
+from decimal import Decimal, ROUND_HALF_UP
+
+
+def to_cents(amount):
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    return float(Decimal(int(cents)) / 100)
+
+
+def split_cents(cents, parts):
+    """Split cents into parts that differ by at most one cent; the first parts get the remainder."""
+    base, remainder = divmod(cents, parts)
+    return [base + 1 if n < remainder else base for n in range(parts)]
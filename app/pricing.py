@@ -0,0 +1,84 @@
+"""Rental pricing in exact integer cents.
+
+A rental of N days (end_date exclusive, as in create_rental) costs the daily
+rate on weekdays and the daily rate plus the item's weekend surcharge on
+Saturdays and Sundays. Stays of WEEKLY_DAYS or MONTHLY_DAYS days or more get
+the item's weekly or monthly discount on the whole subtotal. Percentages are
+applied with round-half-up in integer arithmetic, so a quote and the rental
+booked from it always agree to the cent.
+
+quote_ranges prices any number of candidate ranges in one NumPy pass and
+checks them all against the item's bookings fetched with a single query.
+"""
+import numpy as np
+
+from app.models import Rental
+from app.money import to_cents, from_cents
+
+WEEKLY_DAYS = 7
+MONTHLY_DAYS = 28
+MAX_QUOTE_RANGES = 366
+BLOCKING_STATUSES = ('pending', 'confirmed')
+
+
+def _percent(cents, pct):
+    """cents * pct / 100, rounded half up, for non-negative integer arrays."""
+    return (cents * pct + 50) // 100
+
+
+def price_ranges(item, starts, ends):
+    """Price ranges given as datetime64[D] arrays; returns a dict of int64 arrays."""
+    rate = to_cents(item.daily_rate)
+    weekend_rate = rate + _percent(rate, item.weekend_surcharge_pct or 0)
+    days = (ends - starts).astype(np.int64)
+    weekend_days = np.busday_count(starts, ends, weekmask='0000011')
+    subtotal = (days - weekend_days) * rate + weekend_days * weekend_rate
+    discount_pct = np.select(
+        [days >= MONTHLY_DAYS, days >= WEEKLY_DAYS],
+        [item.monthly_discount_pct or 0, item.weekly_discount_pct or 0],
+        default=0
+    )
+    discount = _percent(subtotal, discount_pct)
+    return {
+        'days': days,
+        'weekend_days': weekend_days,
+        'subtotal': subtotal,
+        'discount': discount,
+        'total': subtotal - discount,
+    }
+
+
+def booked_mask(item_id, starts, ends):
+    """True where a range overlaps a pending/confirmed rental, using one query."""
+    if not len(starts):
+        return np.zeros(0, dtype=bool)
+    rows = Rental.query.with_entities(Rental.start_date, Rental.end_date).filter(
+        Rental.item_id == item_id,
+        Rental.status.in_(BLOCKING_STATUSES),
+        Rental.start_date <= ends.max().item(),
+        Rental.end_date >= starts.min().item()
+    ).all()
+    if not rows:
+        return np.zeros(len(starts), dtype=bool)
+    booked = np.array(rows, dtype='datetime64[D]')
+    # Inclusive overlap test, every range against every booking; create_rental books through this too
+    return ((booked[:, 0] <= ends[:, None]) & (booked[:, 1] >= starts[:, None])).any(axis=1)
+
+
+def quote_ranges(item, ranges):
+    """Quote a list of (start_date, end_date) pairs; returns one dict per range."""
+    starts = np.array([start for start, _ in ranges], dtype='datetime64[D]')
+    ends = np.array([end for _, end in ranges], dtype='datetime64[D]')
+    prices = price_ranges(item, starts, ends)
+    booked = booked_mask(item.id, starts, ends)
+    return [{
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'total_days': int(prices['days'][n]),
+        'weekend_days': int(prices['weekend_days'][n]),
+        'subtotal_cents': int(prices['subtotal'][n]),
+        'discount_cents': int(prices['discount'][n]),
+        'total_cents': int(prices['total'][n]),
+        'total_amount': from_cents(prices['total'][n]),
+        'available': bool(item.is_available and not booked[n]),
+    } for n, (start, end) in enumerate(ranges)]
@@ -0,0 +1,203 @@
+"""Opt-in per-request stack profiles.
+
+A request to the api or main blueprint is profiled when it carries an
+``X-Profile`` header equal to PROFILE_TOKEN, or is picked at random with
+probability PROFILE_SAMPLE_RATE. If neither is configured no hooks are
+registered at all, so there is no per-request cost.
+
+A profiled request gets a sampler thread that records the request thread's
+Python stack every PROFILE_INTERVAL seconds until teardown, so view code,
+SQLAlchemy hydration, Jinja rendering and the after_request hooks are all
+covered. The samples are written to PROFILE_DIR as collapsed stacks
+(``<id>.collapsed.txt``, for flamegraph.pl / speedscope) or as a speedscope
+file (``<id>.speedscope.json``). Alongside goes ``<id>.meta.json`` with the
+endpoint, status, wall time, SQL statement count and time spent in the
+database. The profile id is returned in the ``X-Profile-Id`` header.
+"""
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+from app import db
+
+PROFILED_BLUEPRINTS = {'api', 'main'}
+FORMATS = ('collapsed', 'speedscope')
+
+
+class StackSampler:
+    """Samples one thread's stack from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                # co_qualname is Python 3.11+
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+
+def init_app(app):
+    app.config.setdefault('PROFILE_TOKEN', None)
+    app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+    app.config.setdefault('PROFILE_INTERVAL', 0.001)
+    app.config.setdefault('PROFILE_FORMAT', 'collapsed')
+    app.config.setdefault('PROFILE_DIR', 'profiles')
+    if not app.config['PROFILE_TOKEN'] and app.config['PROFILE_SAMPLE_RATE'] <= 0:
+        return
+    if app.config['PROFILE_FORMAT'] not in FORMATS:
+        raise ValueError(f'PROFILE_FORMAT must be one of {FORMATS}')
+
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(start_profile)
+    app.after_request(tag_response)
+    app.teardown_request(finish_profile)
+
+
+def _wants_profile(config):
+    if request.blueprint not in PROFILED_BLUEPRINTS:
+        return False
+    token = config['PROFILE_TOKEN']
+    header = request.headers.get('X-Profile')
+    if token and header and hmac.compare_digest(header.encode(), token.encode()):
+        return True
+    return random.random() < config['PROFILE_SAMPLE_RATE']
+
+
+def start_profile():
+    config = current_app.config
+    if 'profile' in g or not _wants_profile(config):
+        return
+    sampler = StackSampler(threading.get_ident(), config['PROFILE_INTERVAL'])
+    g.profile = {
+        'id': f"{datetime.utcnow():%Y%m%dT%H%M%S}-{request.endpoint}-{uuid.uuid4().hex[:8]}",
+        'request': request._get_current_object(),
+        'sampler': sampler,
+        'started': time.perf_counter(),
+        'sql_count': 0,
+        'db_time': 0.0,
+    }
+    sampler.start()
+
+
+def _current_profile():
+    # Sub-requests of /api/batch share g with the batch request that owns the profile
+    profile = g.get('profile')
+    if profile is not None and profile['request'] is request._get_current_object():
+        return profile
+    return None
+
+
+def tag_response(response):
+    profile = _current_profile()
+    if profile is not None:
+        profile['status'] = response.status_code
+        response.headers['X-Profile-Id'] = profile['id']
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and 'profile' in g:
+        conn.info.setdefault('profile_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('profile_query_start')
+    if starts and has_app_context() and 'profile' in g:
+        g.profile['sql_count'] += 1
+        g.profile['db_time'] += time.perf_counter() - starts.pop()
+
+
+def finish_profile(exc):
+    profile = _current_profile()
+    if profile is None:
+        return
+    del g.profile
+    sampler = profile['sampler']
+    sampler.stop()
+    config = current_app.config
+    meta = {
+        'id': profile['id'],
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': profile.get('status', 500),
+        'wall_ms': round((time.perf_counter() - profile['started']) * 1000, 3),
+        'sql_count': profile['sql_count'],
+        'db_time_ms': round(profile['db_time'] * 1000, 3),
+        'samples': sum(sampler.stacks.values()),
+        'interval_ms': config['PROFILE_INTERVAL'] * 1000,
+    }
+    base = os.path.join(config['PROFILE_DIR'], profile['id'])
+    try:
+        if config['PROFILE_FORMAT'] == 'speedscope':
+            with open(base + '.speedscope.json', 'w') as f:
+                json.dump(speedscope(sampler.stacks, meta), f)
+        else:
+            with open(base + '.collapsed.txt', 'w') as f:
+                f.writelines(f"{';'.join(stack)} {count}\n" for stack, count in sampler.stacks.items())
+        with open(base + '.meta.json', 'w') as f:
+            json.dump(meta, f, indent=2)
+    except OSError:
+        current_app.logger.exception('Could not write profile %s', profile['id'])
+
+
+def speedscope(stacks, meta):
+    """Build a speedscope 'sampled' profile from collapsed stacks."""
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, count in stacks.items():
+        sample = []
+        for name in stack:
+            if name not in index:
+                index[name] = len(frames)
+                frames.append({'name': name})
+            sample.append(index[name])
+        samples.append(sample)
+        weights.append(count * meta['interval_ms'])
+    name = f"{meta['method']} {meta['path']} ({meta['endpoint']}, {meta['sql_count']} SQL, {meta['db_time_ms']} ms DB)"
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'rentalshop',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights,
+        }],
+    }
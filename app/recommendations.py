@@ -0,0 +1,181 @@
+"""Offline item-item recommendations.
+
+Builds two neighbour lists per item and stores the top K of each in
+ItemSimilarity:
+
+- ``similar``: cosine similarity over users who rented or reviewed both
+  items, blended with same-category and daily-rate proximity.
+- ``also_rented``: cosine similarity over renters only.
+
+Run with ``flask --app main build-recommendations [--full]``. Without
+``--full`` only items whose activity signature changed since the last run
+are recomputed, together with items that share renters/reviewers with them
+or currently list them as a neighbour.
+"""
+import hashlib
+from datetime import datetime
+
+import numpy as np
+from scipy import sparse
+
+from app import db
+from app.models import Item, Rental, ItemReview, ItemSimilarity, ItemSimilarityState
+
+TOP_K = 20
+# Each chunk holds several dense (rows x n_items) float64 arrays at once;
+# rows are sized so one such array stays near CHUNK_CELLS cells (~16 MB)
+CHUNK_CELLS = 2_000_000
+MAX_CHUNK_ROWS = 512
+IN_CHUNK = 500
+
+ACTIVITY_WEIGHT = 0.6
+CATEGORY_WEIGHT = 0.25
+PRICE_WEIGHT = 0.15
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _load_items():
+    rows = db.session.query(Item.id, Item.category, Item.daily_rate).order_by(Item.id).all()
+    ids = np.array([r.id for r in rows], dtype=np.int64)
+    _, category_codes = np.unique(np.array([r.category for r in rows], dtype=object), return_inverse=True)
+    log_rates = np.log1p(np.array([max(r.daily_rate or 0.0, 0.0) for r in rows], dtype=np.float64))
+    return rows, ids, category_codes, log_rates
+
+
+def _incidence(pairs, item_index, n_items):
+    """Binary items x users matrix from (item_id, user_id) pairs."""
+    pairs = [(item_index[i], u) for i, u in pairs if i in item_index]
+    if not pairs:
+        return sparse.csr_matrix((n_items, 0), dtype=np.float64)
+    rows = np.array([p[0] for p in pairs], dtype=np.int64)
+    users, cols = np.unique(np.array([p[1] for p in pairs], dtype=np.int64), return_inverse=True)
+    matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_items, len(users)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1.0
+    return matrix
+
+
+def _signatures(rows):
+    """Hash of everything an item's neighbour lists depend on."""
+    rentals = dict((r[0], r[1:]) for r in db.session.query(
+        Rental.item_id, db.func.count(Rental.id), db.func.max(Rental.id)
+    ).filter(Rental.status != 'cancelled').group_by(Rental.item_id))
+    reviews = dict((r[0], r[1:]) for r in db.session.query(
+        ItemReview.item_id, db.func.count(ItemReview.id), db.func.max(ItemReview.id)
+    ).group_by(ItemReview.item_id))
+    signatures = {}
+    for row in rows:
+        raw = f'{row.category}|{row.daily_rate}|{rentals.get(row.id)}|{reviews.get(row.id)}'
+        signatures[row.id] = hashlib.sha1(raw.encode()).hexdigest()
+    return signatures
+
+
+def _cosine_rows(matrix, norms, row_idx):
+    """Dense cosine similarity of the given rows against every item."""
+    dense = (matrix[row_idx] @ matrix.T).toarray()
+    denom = norms[row_idx][:, None] * norms[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denom > 0, dense / denom, 0.0)
+
+
+def _top_k(scores, k):
+    """Column indices of the k best scores per row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def build_similar_items(full=False, top_k=TOP_K):
+    """Recompute stored neighbours and return the number of items refreshed."""
+    rows, ids, category_codes, log_rates = _load_items()
+    n_items = len(ids)
+    item_index = {int(item_id): idx for idx, item_id in enumerate(ids)}
+
+    signatures = _signatures(rows)
+    stored = dict(db.session.query(ItemSimilarityState.item_id, ItemSimilarityState.signature))
+    removed = set(stored) - set(item_index)
+    dirty = set(item_index) if full else {i for i, sig in signatures.items() if stored.get(i) != sig}
+
+    # Drop everything that belongs to deleted items
+    for chunk in _chunks(removed, IN_CHUNK):
+        ItemSimilarity.query.filter(ItemSimilarity.item_id.in_(chunk)).delete(synchronize_session=False)
+        ItemSimilarityState.query.filter(ItemSimilarityState.item_id.in_(chunk)).delete(synchronize_session=False)
+
+    rental_pairs = db.session.query(Rental.item_id, Rental.renter_id).filter(Rental.status != 'cancelled').all()
+    review_pairs = db.session.query(ItemReview.item_id, ItemReview.user_id).all()
+    rented = _incidence(rental_pairs, item_index, n_items)
+    activity = _incidence(rental_pairs + review_pairs, item_index, n_items)
+    activity_norms = np.sqrt(np.asarray(activity.multiply(activity).sum(axis=1)).ravel())
+    rented_norms = np.sqrt(np.asarray(rented.multiply(rented).sum(axis=1)).ravel())
+
+    affected = set(dirty)
+    if not full and (dirty or removed):
+        if dirty:
+            dirty_idx = np.array(sorted(item_index[i] for i in dirty), dtype=np.int64)
+            linked = (activity[dirty_idx] @ activity.T).tocoo().col
+            affected.update(int(ids[c]) for c in np.unique(linked))
+        for chunk in _chunks(dirty | removed, IN_CHUNK):
+            affected.update(r[0] for r in db.session.query(ItemSimilarity.item_id).filter(
+                ItemSimilarity.neighbor_id.in_(chunk)
+            ).distinct())
+        affected &= set(item_index)
+
+    now = datetime.utcnow()
+    affected_idx = np.array(sorted(item_index[i] for i in affected), dtype=np.int64)
+    chunk_rows = max(1, min(MAX_CHUNK_ROWS, CHUNK_CELLS // max(n_items, 1)))
+    for start in range(0, len(affected_idx), chunk_rows):
+        row_idx = affected_idx[start:start + chunk_rows]
+        chunk_ids = [int(ids[r]) for r in row_idx]
+
+        activity_sim = _cosine_rows(activity, activity_norms, row_idx)
+        rented_sim = _cosine_rows(rented, rented_norms, row_idx)
+        same_category = (category_codes[row_idx][:, None] == category_codes[None, :]).astype(np.float64)
+        price_proximity = np.exp(-np.abs(log_rates[row_idx][:, None] - log_rates[None, :]))
+        similar = (ACTIVITY_WEIGHT * activity_sim
+                   + CATEGORY_WEIGHT * same_category
+                   + PRICE_WEIGHT * price_proximity)
+
+        self_cols = (np.arange(len(row_idx)), row_idx)
+        similar[self_cols] = -np.inf
+        rented_sim[self_cols] = -np.inf
+
+        records = []
+        for kind, scores in (('similar', similar), ('also_rented', rented_sim)):
+            best = _top_k(scores, top_k)
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            for r, item_id in enumerate(chunk_ids):
+                rank = 0
+                for col, score in zip(best[r], best_scores[r]):
+                    if score <= 0:
+                        break
+                    records.append({
+                        'item_id': item_id,
+                        'kind': kind,
+                        'rank': rank,
+                        'neighbor_id': int(ids[col]),
+                        'score': round(float(score), 6)
+                    })
+                    rank += 1
+
+        ItemSimilarity.query.filter(ItemSimilarity.item_id.in_(chunk_ids)).delete(synchronize_session=False)
+        ItemSimilarityState.query.filter(ItemSimilarityState.item_id.in_(chunk_ids)).delete(synchronize_session=False)
+        if records:
+            db.session.execute(db.insert(ItemSimilarity), records)
+        db.session.execute(db.insert(ItemSimilarityState), [
+            {'item_id': item_id, 'signature': signatures[item_id], 'computed_at': now}
+            for item_id in chunk_ids
+        ])
+
+    db.session.commit()
+    return len(affected)
@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from app import db
 from app.models import Item, Rental, Payment, User
+from app.api import get_reviews_page, rating_summary, rating_summaries, similar_items
+from app.cache import cached_page, fragments
 from werkzeug.utils import secure_filename
 from datetime import datetime, date
 import os
@@ -13,10 +15,29 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def render_item_cards(items, show_location=False):
+    """Render item cards, reusing cached HTML for unchanged item versions"""
+    cache = fragments()
+    keys = [('item_card', item.id, item.version, show_location) for item in items]
+    cards = [cache.get(key) for key in keys]
+    missing = [item.id for item, card in zip(items, cards) if card is None]
+    if missing:
+        ratings = rating_summaries(missing)
+        for i, item in enumerate(items):
+            if cards[i] is None:
+                average_rating, rating_count = ratings.get(item.id, (None, 0))
+                cards[i] = render_template('_item_card.html', item=item,
+                                           average_rating=average_rating,
+                                           rating_count=rating_count,
+                                           show_location=show_location)
+                cache.set(keys[i], cards[i])
+    return cards
+
 @main_bp.route('/')
+@cached_page
 def index():
     items = Item.query.filter_by(is_available=True).limit(12).all()
-    return render_template('index.html', items=items)
+    return render_template('index.html', cards=render_item_cards(items))
 
 @main_bp.route('/dashboard')
 @login_required
@@ -37,6 +58,7 @@ def dashboard():
                          rentals_as_owner=rentals_as_owner)
 
 @main_bp.route('/items')
+@cached_page
 def items():
     category = request.args.get('category', '')
     search = request.args.get('search', '')
@@ -50,12 +72,33 @@ def items():
         query = query.filter(Item.name.contains(search) | Item.description.contains(search))
     
     items = query.all()
-    return render_template('items.html', items=items, category=category, search=search)
+    return render_template('items.html', cards=render_item_cards(items, show_location=True),
+                         category=category, search=search)
 
 @main_bp.route('/items/<int:item_id>')
+@cached_page
 def item_detail(item_id):
     item = Item.query.get_or_404(item_id)
-    return render_template('item_detail.html', item=item)
+    cache = fragments()
+    
+    def render_summary():
+        average_rating, rating_count = rating_summary(item_id)
+        return render_template('_item_detail_summary.html', item=item,
+                               average_rating=average_rating,
+                               rating_count=rating_count)
+    
+    def render_reviews():
+        reviews, next_review_before = get_reviews_page(item_id)
+        return render_template('_item_reviews.html', reviews=reviews,
+                               next_review_before=next_review_before)
+    
+    summary_html = cache.get_or_set(('item_summary', item.id, item.version), render_summary)
+    reviews_html = cache.get_or_set(('item_reviews', item.id, item.version), render_reviews)
+    recommendations = similar_items(item_id, limit=4)
+    return render_template('item_detail.html', item=item,
+                         summary_html=summary_html,
+                         reviews_html=reviews_html,
+                         recommendations=recommendations)
 
 @main_bp.route('/uploads/<filename>')
 def uploaded_file(filename):
@@ -0,0 +1,56 @@
+"""Delta sync for mobile clients.
+
+The cursor is an opaque, URL-safe token holding one (updated_at, id)
+position per entity. Each call returns rows strictly after that position,
+in (updated_at, id) order, so a cursor only ever moves forward and a
+reconnect reads only what changed.
+
+Rows touched in the last SETTLE_SECONDS are held back until the next call.
+A transaction that stamped updated_at earlier but committed later can then
+not slip behind a cursor that has already moved past it.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from app import db
+
+SETTLE_SECONDS = 2
+ENTITIES = ('items', 'rentals', 'reviews', 'messages', 'deleted')
+
+
+def decode_cursor(token):
+    """Return {entity: (updated_at, id)}; raises ValueError on a bad token."""
+    if not token:
+        return {}
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token.encode() + b'=' * (-len(token) % 4)))
+        return {
+            entity: (datetime.fromisoformat(raw[entity][0]), int(raw[entity][1]))
+            for entity in ENTITIES if entity in raw
+        }
+    except (TypeError, KeyError, IndexError, json.JSONDecodeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def encode_cursor(positions):
+    raw = {entity: [ts.isoformat(), row_id] for entity, (ts, row_id) in positions.items()}
+    return base64.urlsafe_b64encode(json.dumps(raw, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def changed_since(query, model, position, limit):
+    """Rows of query after position, oldest first; returns (rows, new_position, has_more)."""
+    query = query.filter(model.updated_at <= datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS))
+    if position:
+        updated_at, row_id = position
+        query = query.filter(db.or_(
+            model.updated_at > updated_at,
+            db.and_(model.updated_at == updated_at, model.id > row_id)
+        ))
+    rows = query.order_by(model.updated_at, model.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        position = (rows[-1].updated_at, rows[-1].id)
+    return rows, position, has_more
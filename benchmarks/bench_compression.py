@@ -0,0 +1,106 @@
+"""Compression and conditional-GET benchmark.
+
+Seeds a throwaway database, then for a few endpoints reports the
+identity/gzip/brotli body sizes, the CPU time spent compressing one body,
+and the latency of a full 200 versus an If-None-Match 304.
+
+The streaming section compresses the CSV export fed one row per chunk
+through compress_stream (as a streamed response is) and compares it with
+one-shot compression, then times the streamed /api/items/export endpoint.
+
+    python benchmarks/bench_compression.py [--items N] [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def sizes_of(body, encoding, config):
+    from app import compression
+    return len(compression.compress(body, encoding, config))
+
+
+def seed(app, db, n_items):
+    from app.models import User, Item
+
+    with app.app_context():
+        owner = User(username='owner', email='owner@example.com', full_name='Bench Owner')
+        owner.set_password('password')
+        db.session.add(owner)
+        db.session.flush()
+        db.session.add_all(Item(
+            name=f'Bench item {n}',
+            description='A well looked after item available for short and long rentals. ' * 2,
+            category=('camera', 'bike', 'tools', 'car')[n % 4],
+            daily_rate=10 + n % 90,
+            location='Bengaluru',
+            owner_id=owner.id
+        ) for n in range(n_items))
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_PATH'] = os.path.join(tmp, 'bench.db')
+        from app import create_app, db
+        from app import compression
+
+        app = create_app()
+        seed(app, db, args.items)
+        client = app.test_client()
+
+        print(f'{args.items} items, median of {args.repeat}')
+        print(f'{"endpoint":14s} {"identity":>9s} {"gzip":>9s} {"br":>9s} {"gzip ms":>8s} {"br ms":>8s} {"200 ms":>8s} {"304 ms":>8s}')
+        for path in ('/api/items', '/items', '/api/items/1'):
+            body = client.get(path).get_data()
+            sizes, cpu = {}, {}
+            for encoding in compression.ENCODINGS:
+                sizes[encoding] = len(compression.compress(body, encoding, app.config))
+                cpu[encoding] = median_ms(lambda: compression.compress(body, encoding, app.config), args.repeat)
+            etag = client.get(path, headers={'Accept-Encoding': 'gzip'}).headers.get('ETag')
+            full = median_ms(lambda: client.get(path, headers={'Accept-Encoding': 'gzip'}), args.repeat)
+            revalidate = median_ms(
+                lambda: client.get(path, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}),
+                args.repeat
+            )
+            print(f'{path:14s} {len(body):9d} {sizes.get("gzip", 0):9d} {sizes.get("br", 0):9d} '
+                  f'{cpu.get("gzip", 0):8.2f} {cpu.get("br", 0):8.2f} {full:8.2f} {revalidate:8.2f}')
+        
+        client.post('/auth/login', json={'username': 'owner', 'password': 'password'})
+        export = client.get('/api/items/export').get_data()
+        rows = export.splitlines(keepends=True)
+        print()
+        print(f'streamed CSV export, {len(rows)} one-row chunks, {len(export)} bytes identity')
+        print(f'{"encoding":9s} {"one-shot":>9s} {"streamed":>9s} {"stream ms":>10s} {"GET ms":>8s}')
+        for encoding in compression.ENCODINGS:
+            streamed = b''.join(compression.compress_stream(rows, encoding, app.config))
+            stream_ms = median_ms(lambda: b''.join(compression.compress_stream(rows, encoding, app.config)), args.repeat)
+            get_ms = median_ms(
+                lambda: client.get('/api/items/export', headers={'Accept-Encoding': encoding}).get_data(),
+                args.repeat
+            )
+            print(f'{encoding:9s} {sizes_of(export, encoding, app.config):9d} {len(streamed):9d} {stream_ms:10.2f} {get_ms:8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Item deletion benchmark: ORM cascade vs set-based Item.purge().
+
+For each child count N the item gets N rentals (each with a payment),
+N reviews and N messages, then is deleted either with session.delete()
+(the old delete_item path, which loads every child) or with Item.purge().
+
+    python benchmarks/bench_delete.py [--children 100 1000 10000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+def seed_item(db, models, n_children, users):
+    Item, Rental, Payment, ItemReview, ItemMessage = models
+    owner_id = users[0]
+    item = Item(name='Bench item', category='camera', daily_rate=10.0, owner_id=owner_id)
+    db.session.add(item)
+    db.session.flush()
+    today = date.today()
+    now = datetime.utcnow()
+    db.session.execute(db.insert(Rental), [{
+        'item_id': item.id, 'renter_id': users[1 + n % (len(users) - 1)],
+        'start_date': today + timedelta(days=2 * n), 'end_date': today + timedelta(days=2 * n + 1),
+        'total_days': 1, 'total_amount': 10.0, 'status': 'completed', 'created_at': now, 'updated_at': now
+    } for n in range(n_children)])
+    rental_ids = [r[0] for r in db.session.query(Rental.id).filter(Rental.item_id == item.id)]
+    db.session.execute(db.insert(Payment), [{
+        'rental_id': rental_id, 'amount': 10.0, 'status': 'completed', 'created_at': now
+    } for rental_id in rental_ids])
+    db.session.execute(db.insert(ItemReview), [{
+        'item_id': item.id, 'user_id': users[1 + n], 'rating': 1 + n % 5, 'created_at': now, 'updated_at': now
+    } for n in range(n_children)])
+    db.session.execute(db.insert(ItemMessage), [{
+        'item_id': item.id, 'sender_id': users[1 + n % (len(users) - 1)], 'receiver_id': owner_id,
+        'content': 'Is this still available?', 'is_read': False, 'created_at': now, 'updated_at': now
+    } for n in range(n_children)])
+    db.session.commit()
+    return item.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--children', type=int, nargs='+', default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_PATH'] = os.path.join(tmp, 'bench.db')
+        from app import create_app, db
+        from app.models import User, Item, Rental, Payment, ItemReview, ItemMessage
+
+        app = create_app()
+        models = (Item, Rental, Payment, ItemReview, ItemMessage)
+        with app.app_context():
+            db.session.execute(db.insert(User), [{
+                'username': f'user{n}', 'email': f'user{n}@example.com',
+                'password_hash': 'x', 'full_name': f'User {n}'
+            } for n in range(max(args.children) + 1)])
+            db.session.commit()
+            users = [r[0] for r in db.session.query(User.id).order_by(User.id)]
+
+            print(f'{"children":>9s} {"session.delete ms":>18s} {"Item.purge ms":>14s}')
+            for n_children in args.children:
+                item_id = seed_item(db, models, n_children, users)
+                start = time.perf_counter()
+                db.session.delete(db.session.get(Item, item_id))
+                db.session.commit()
+                orm_ms = (time.perf_counter() - start) * 1000
+
+                item_id = seed_item(db, models, n_children, users)
+                db.session.expunge_all()
+                start = time.perf_counter()
+                Item.purge([item_id])
+                db.session.commit()
+                purge_ms = (time.perf_counter() - start) * 1000
+
+                print(f'{n_children:9d} {orm_ms:18.1f} {purge_ms:14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Startup benchmark: process start to first served request.
+
+Each run spawns a fresh interpreter that imports the app, calls create_app()
+and serves ``GET /`` through the test client, so the figure includes imports,
+the schema check and first-request template compilation.
+
+    python benchmarks/bench_startup.py [--runs N]
+
+"cold" runs start against an empty database (tables are created); "warm"
+runs reuse a database already at SCHEMA_VERSION (DDL is skipped).
+
+Process startup is dominated by imports, so the schema step is also timed
+on its own against the existing database: the user_version check that
+create_app() does now, and the create_all() + upgrade_schema() it used to
+run on every start.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CHILD = """
+import time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get('/')
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+
+from app import db, ensure_schema, upgrade_schema
+check_start = time.perf_counter()
+ensure_schema(app)
+ddl_start = time.perf_counter()
+with app.app_context():
+    db.create_all()
+    upgrade_schema()
+ddl_done = time.perf_counter()
+print(created - start, done - start, ddl_start - check_start, ddl_done - ddl_start)
+"""
+
+
+def run_once(db_path):
+    env = dict(os.environ, DATABASE_PATH=db_path)
+    out = subprocess.run(
+        [sys.executable, '-c', CHILD], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return tuple(float(x) for x in out.split())
+
+
+def median_ms(samples, column):
+    return statistics.median(s[column] for s in samples) * 1000
+
+
+def report(label, samples):
+    print(f'{label:5s}  create_app {median_ms(samples, 0):7.1f} ms   '
+          f'first request {median_ms(samples, 1):7.1f} ms   (median of {len(samples)})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cold = []
+        for n in range(args.runs):
+            cold.append(run_once(os.path.join(tmp, f'cold_{n}.db')))
+        warm_db = os.path.join(tmp, 'warm.db')
+        run_once(warm_db)
+        warm = [run_once(warm_db) for _ in range(args.runs)]
+
+    report('cold', cold)
+    report('warm', warm)
+    print(f'schema step on an existing database: version check {median_ms(warm, 2):.2f} ms, '
+          f'create_all + upgrade_schema {median_ms(warm, 3):.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
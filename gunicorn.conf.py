@@ -0,0 +1,17 @@
+# Gunicorn settings, picked up automatically from the working directory.
+#
+# preload_app imports main:app once in the master, so create_app() and the
+# schema check run once instead of once per worker. Workers then inherit the
+# master's SQLAlchemy pool, which must not be shared across processes, so each
+# worker drops the inherited connections right after the fork.
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def post_fork(server, worker):
+    from main import app
+    from app import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)